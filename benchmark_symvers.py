@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+# Copyright 2023 Red Hat Inc.
+# Author: Chris Procter <cprocter@redhat.com>
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.  See
+# http://www.gnu.org/copyleft/gpl.html for the full text of the
+# license.
+
+"""
+    compare how fast plain and compressed Module.symvers files are read
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+import shutil
+import time
+import gzip
+import lzma
+
+import kscsymvers
+
+def main():
+    """
+        compress the given Module.symvers each supported way and time reading them all
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--repeat", action="store", type=int, dest="repeat", default=5,
+                        help="number of times to read each file (default 5)", metavar="N")
+    parser.add_argument("symvers", help="path to a plain text Module.symvers", metavar="FILE")
+    options = parser.parse_args()
+
+    with open(options.symvers, "rb") as fptr:
+        content = fptr.read()
+
+    temp_dir = tempfile.mkdtemp()
+    kernel_dir = os.path.join(temp_dir, "kernel")
+    os.mkdir(kernel_dir)
+    symverfile = os.path.join(kernel_dir, "Module.symvers")
+
+    compressors = {"": lambda data: data,
+                   ".xz": lzma.compress,
+                   ".gz": gzip.compress}
+    if kscsymvers.zstandard is not None:
+        compressors[".zst"] = kscsymvers.zstandard.ZstdCompressor().compress
+    else:
+        print("zstandard module not installed, skipping .zst", file=sys.stderr)
+
+    print("%-8s,%-10s,%-10s,%s"%("format", "size", "seconds", "MB/s"))
+    try:
+        for suffix, compress in compressors.items():
+            for old in kscsymvers.SYMVERS_SUFFIXES:
+                if os.path.exists(symverfile + old):
+                    os.unlink(symverfile + old)
+            with open(symverfile + suffix, "wb") as fptr:
+                fptr.write(compress(content))
+
+            start = time.perf_counter()
+            for _ in range(options.repeat):
+                kscsymvers.read_symvers(temp_dir, "kernel")
+            elapsed = (time.perf_counter() - start) / options.repeat
+
+            print("%-8s,%-10d,%-10.4f,%.1f"%(suffix or "plain",
+                                             os.path.getsize(symverfile + suffix),
+                                             elapsed,
+                                             len(content) / elapsed / 1024 / 1024))
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -15,6 +15,8 @@ import sys
 import re
 import argparse
 
+import kscsymvers
+
 def read_whitelist(fpath):
     """
         read the whitelist file
@@ -40,17 +42,9 @@ def read_symvers(symverdir, kernelversion):
     """
 	read the list of symbols in the kernel
     """
-    symverfile = os.path.join(symverdir, kernelversion, "Module.symvers")
-
-    result = dict()
     try:
-        with open(symverfile, "r") as fptr:
-            for line in fptr.readlines():
-                if line.startswith("["):
-                    continue
-                fields = line.split()
-                result[fields[1]] = fields[0]
-    except IOError as err:
+        result = kscsymvers.read_symvers(symverdir, kernelversion)
+    except kscsymvers.SYMVERS_ERRORS as err:
         print(err)
         print("Missing all symbol list")
         print("Do you have the kernel-devel package installed?")
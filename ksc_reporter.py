@@ -20,9 +20,16 @@ import tempfile
 import shutil
 import lzma
 import fnmatch
+import threading
+import collections
+import concurrent.futures
+import hashlib
 
 import kscreport
 import kscresult
+import kscsymvers
+import kscstablelists
+import kscerrors
 # ksc installs into a non-standard pythonpath because *sigh*
 sys.path.append('/usr/share/')
 sys.path.append('/usr/share/ksc')
@@ -30,6 +37,19 @@ sys.path.append('/usr/share/ksc')
 import ksc
 import utils
 
+# override the value in utils so we can control the whitelist dir we use, set
+# once here rather than by each KscRunner as runners may be in several threads
+utils.WHPATH = ""
+
+# ELF e_machine values of the architectures with stablelists
+ELF_MACHINES = {62: "x86_64", 183: "aarch64", 21: "ppc64le", 22: "s390x"}
+
+# symvers read by analyse(), kept for later calls
+_SYMVERS_CACHE = kscsymvers.SymversCache()
+
+# exit code used by --gate when at least one kmod fails against a kernel
+GATE_FAILED = 3
+
 def main():
     """
         run the test, print the result
@@ -66,6 +86,31 @@ def main():
     parser.add_argument("-q", "--quiet",
                         action="store_true", dest="quiet", default=False,
                         help="do not write report to stdout")
+    parser.add_argument("--gate",
+                        action="store_true", dest="gate", default=False,
+                        help="pass/fail mode: stop checking a kmod at its first changed or "
+                             "unknown symbol, print a verdict table and exit with %d "
+                             "if any kmod fails"%GATE_FAILED)
+    parser.add_argument("--max-failures", action="store", type=int, dest="max_failures",
+                        default=0, metavar="N",
+                        help="in --gate mode stop testing further kernels once more than "
+                             "N kmod/kernel pairs have failed across all architectures, each "
+                             "path given counts even if its kmod is identical to another "
+                             "(default 0)")
+    parser.add_argument("--readahead", action="store", type=int, dest="readahead",
+                        default=2, metavar="N",
+                        help="number of kernels whose Module.symvers are read ahead "
+                             "while earlier kernels are classified (default 2)")
+    parser.add_argument("--readahead-mb", action="store", type=int, dest="readahead_mb",
+                        default=None, metavar="MB",
+                        help="maximum size of Module.symvers files held in the read "
+                             "ahead queue (default unlimited), each kernel's symbols are "
+                             "released once its kmods are classified so this bounds the "
+                             "kernel symbols held in memory")
+    parser.add_argument("--stablelist-cache", action="store", dest="stablelist_cache",
+                        default=kscstablelists.DEFAULT_CACHE, metavar="FILE",
+                        help="file to cache the parsed stablelists of all arches in "
+                             "(default %s, '' to disable)"%kscstablelists.DEFAULT_CACHE)
     parser.add_argument("module", nargs='*',
                         help="path to a kmod file (as per the --kmod arg)", metavar="KMOD")
 
@@ -79,26 +124,31 @@ def main():
         sys.exit(0)
 
     if options.kmods or options.module:
-        (kernel_module_files, temp_dir) = extract_xz_files(options.kmods + options.module)
+        raw_ko_files = (options.kmods or []) + options.module
     elif options.kmoddir:
-        files_in_dir = [os.path.join(options.kmoddir, f) for f in os.listdir(options.kmoddir)
+        raw_ko_files = [os.path.join(options.kmoddir, f) for f in os.listdir(options.kmoddir)
                         if os.path.isfile(os.path.join(options.kmoddir, f))]
-        (kernel_module_files, temp_dir) = extract_xz_files(files_in_dir)
     else:
         print("at least one ko file is required")
         sys.exit(1)
 
+    # copies of the same kmod are spotted before extraction so each unique
+    # kmod is only decompressed and analysed once
+    try:
+        (raw_ko_files, raw_aliases) = dedupe_kmods([k for k in raw_ko_files
+                                                    if k[-3:] in (".ko", ".xz")])
+    except kscerrors.KscReporterError as err:
+        print(err)
+        sys.exit(err.exit_code)
+    (kernel_module_files, temp_dir) = extract_xz_files(raw_ko_files)
+    # the extracted path (key) to the path the user gave (value)
+    kmod_names = dict(zip(kernel_module_files, raw_ko_files))
+    kmod_aliases = {k: raw_aliases[raw] for k, raw in kmod_names.items()}
+
     if kernel_module_files == []:
         print("no valid ko files supplied")
         sys.exit(1)
 
-    runner = KscRunner(kernel_module_files,
-                       options.releasedir,
-                       options.symverdir
-                       )
-
-    report = kscreport.KscReport()
-
     kernels = options.kernels
     if not kernels:
         if options.kernelmatch and options.symverdir:
@@ -106,11 +156,44 @@ def main():
         else:
             kernels = [os.uname().release]
 
-    runner.sanity_check_kmods()
+    if options.gate:
+        options.report = "gate"
+
+    stablelist_index = kscstablelists.StablelistIndex.load([options.releasedir],
+                                                           options.stablelist_cache)
 
-    for k in kernels:
-        ksc_result = runner.generate_ksc(k)
-        report.add_ksc(ksc_result)
+    report = kscreport.KscReport()
+
+    # kmods of each architecture are tested against their own stablelist and
+    # kernels, each in its own thread. this overlaps their symvers reads and the
+    # subprocesses ksc runs but the GIL still serialises the python parsing and
+    # classification, so it is not parallel analysis
+    try:
+        # every arch must have kernels to test against before any are run, so
+        # a gate can't pass because one arch's kmods were never tested
+        arch_runs = [(kmods, kernels_for_arch(kernels, arch, kmods))
+                     for arch, kmods in group_kmods_by_arch(kernel_module_files).items()]
+        # the --max-failures budget is shared by every arch's thread
+        budget = FailureBudget(options.max_failures)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(arch_runs)) as executor:
+            futures = list()
+            for (kmods, arch_kernels) in arch_runs:
+                futures.append(executor.submit(run_kernels, kmods, arch_kernels,
+                                               stablelist_index, report, options,
+                                               kmod_aliases, kmod_names, budget))
+
+            failures = 0
+            skipped = list()
+            for future in futures:
+                (arch_failures, arch_skipped) = future.result()
+                failures += arch_failures
+                # the same kernel may be skipped for several architectures
+                skipped += [k for k in arch_skipped if k not in skipped]
+    except kscerrors.KscReporterError as err:
+        print(err)
+        if temp_dir:
+            shutil.rmtree(temp_dir)
+        sys.exit(err.exit_code)
 
     try:
         report_method = report = getattr(report, 'report_' + options.report)
@@ -121,14 +204,249 @@ def main():
     report_text = report_method(options.reportfile, options.overwrite)
     if not options.quiet:
         print(report_text)
+        if skipped:
+            print("failure budget exceeded, %d kernels not tested: %s"%(
+                len(skipped), " ".join(skipped)))
 
 
     if temp_dir:
         shutil.rmtree(temp_dir)
 
+    if options.gate and failures > 0:
+        sys.exit(GATE_FAILED)
+
     sys.exit(0)
 
 
+def analyse(kmods, kernels,
+            releasedir="/lib/modules/kabi-current/",
+            symverdir="/usr/src/kernels/"):
+    """
+    test kmods against kernels in process, for use as a library rather than
+    through main(). symvers and stablelists read are cached and reused by later
+    calls in the same process while their files are unchanged, up to
+    _SYMVERS_CACHE.max_entries kernels, clear_caches() empties the caches
+    args:
+        kmods - list - paths to .ko or .ko.xz files, or (name, bytes) tuples
+                       holding the contents of a kmod (which may be xz compressed
+                       if the name ends .xz), each kmod must have a different name
+        kernels - list - the kernel versions to test against
+        releasedir - string - directory containing the stablelists to use
+        symverdir - string - directory containing [KERNEL]/Module.symvers
+    returns:
+        a list of KscResult objects, one per kernel per architecture of kmods
+    raises:
+        kscerrors.KscReporterError (or a subclass of it) if the kmods can't be tested
+    """
+    # in memory kmods are written to memfds which are passed to the ksc tools
+    # as /proc/[pid]/fd/[fd], this (key) to the (fd, name) (value)
+    memfds = dict()
+    paths = list()
+    try:
+        for k in kmods:
+            try:
+                if isinstance(k, str):
+                    if not k.endswith(".xz"):
+                        paths.append(k)
+                        continue
+                    with lzma.open(k) as xzfile:
+                        k = (os.path.basename(k[:-3]), xzfile.read())
+
+                (name, content) = k
+                if name.endswith(".xz"):
+                    (name, content) = (name[:-3], lzma.decompress(content))
+            except (IOError, EOFError, lzma.LZMAError) as err:
+                raise kscerrors.KmodReadError("unable to read kmod %s: %s"%(
+                    k if isinstance(k, str) else k[0], err)) from err
+            fd = os.memfd_create(name)
+            memfds["/proc/%d/fd/%d"%(os.getpid(), fd)] = (fd, name)
+            with open(fd, "wb", closefd=False) as kofile:
+                kofile.write(content)
+            paths.append("/proc/%d/fd/%d"%(os.getpid(), fd))
+
+        stablelist_index = kscstablelists.StablelistIndex.load([releasedir], None)
+        results = list()
+        for arch, arch_kmods in group_kmods_by_arch(paths).items():
+            arch_kernels = kernels_for_arch(kernels, arch, arch_kmods)
+            runner = KscRunner(arch_kmods, releasedir, symverdir,
+                               stablelist_index, _SYMVERS_CACHE)
+            runner.rename_kmods({path: name for path, (fd, name) in memfds.items()
+                                 if path in arch_kmods})
+            runner.sanity_check_kmods()
+            for kernel in arch_kernels:
+                results.append(runner.generate_ksc(kernel))
+        return results
+    finally:
+        for (fd, name) in memfds.values():
+            os.close(fd)
+
+
+def clear_caches():
+    """
+        drop the symvers and stablelists analyse() has cached
+    """
+    _SYMVERS_CACHE.clear()
+    kscstablelists.clear_cache()
+
+
+def run_kernels(kmods, kernels, stablelist_index, report, options,
+                kmod_aliases=None, kmod_names=None, budget=None):
+    """
+        test a set of kmods of one architecture against kernels, adding the
+        results to report
+        kmod_aliases - dict - kmod (key) to other paths with identical contents (value)
+        kmod_names - dict - kmod (key) to the path to report it as (value), e.g.
+                            the .xz file a temp file was extracted from
+        budget - FailureBudget - the --gate failures allowed, shared with the
+                                 run_kernels of other architectures (a budget of
+                                 options.max_failures for this run alone if None)
+    returns:
+        failures - the number of failing kmod/kernel pairs in --gate mode, each
+                   path to an identical kmod counted separately
+        skipped - the kernels not tested because the failure budget was exceeded
+    """
+    runner = KscRunner(kmods,
+                       options.releasedir,
+                       options.symverdir,
+                       stablelist_index,
+                       kmod_aliases=kmod_aliases
+                       )
+    if kmod_names:
+        runner.rename_kmods({k: name for k, name in kmod_names.items()
+                             if k in runner.kmods and k != name})
+
+    runner.sanity_check_kmods()
+
+    max_bytes = None
+    if options.readahead_mb:
+        max_bytes = options.readahead_mb * 1024 * 1024
+
+    if budget is None:
+        budget = FailureBudget(options.max_failures)
+
+    failures = 0
+    skipped = []
+    with SymversPrefetcher(runner, kernels, options.readahead, max_bytes) as prefetcher:
+        for i, (k, symvers) in enumerate(prefetcher):
+            # another architecture may have used up the budget
+            if options.gate and budget.exceeded():
+                skipped = kernels[i:]
+                break
+            ksc_result = runner.generate_ksc(k, symvers)
+            report.add_ksc(ksc_result)
+            kmod_failures = 0
+            if options.gate:
+                kmod_failures = sum(ksc_result.kmod_copies(ko_file)
+                                    for ko_file in ksc_result.get_failed_kmods())
+                failures += kmod_failures
+            else:
+                ksc_result.classify()
+            # the report only needs the classified symbols
+            ksc_result.release_symvers()
+            if options.gate and budget.add(kmod_failures):
+                skipped = kernels[i+1:]
+                break
+
+    return (failures, skipped)
+
+
+def kmod_arch(path):
+    """
+        get the architecture a kmod is built for from its ELF header
+        returns the arch name as used in stablelist file names or None if unknown
+    """
+    try:
+        with open(path, "rb") as fptr:
+            header = fptr.read(20)
+    except IOError as err:
+        raise kscerrors.KmodReadError("unable to read kmod %s: %s"%(path, err)) from err
+    if len(header) < 20 or header[:4] != b"\x7fELF":
+        return None
+    byteorder = "little" if header[5] == 1 else "big"
+    machine = int.from_bytes(header[18:20], byteorder)
+    if machine == 21 and byteorder == "big":
+        return "ppc64"
+    return ELF_MACHINES.get(machine)
+
+
+def kmod_digest(path):
+    """
+        get the sha256 of a kmod's contents so identical kmods can be spotted
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as fptr:
+            for chunk in iter(lambda: fptr.read(1024 * 1024), b""):
+                digest.update(chunk)
+    except IOError as err:
+        raise kscerrors.KmodReadError("unable to read kmod %s: %s"%(path, err)) from err
+    return digest.hexdigest()
+
+
+def dedupe_kmods(kmods):
+    """
+        spot kmods with identical contents, a path given more than once (or
+        another path to the same file) is dropped rather than made an alias.
+        files are compared by device and inode rather than realpath as every
+        memfd's realpath is /memfd:[name] (deleted)
+    returns:
+        unique - the first path seen with each content
+        aliases - dict of each unique path (key) to the other paths with the
+                  same content (value)
+    """
+    aliases = dict()
+    digests = dict()
+    seen = set()
+    for kmod_path in kmods:
+        try:
+            stat = os.stat(kmod_path)
+        except OSError as err:
+            raise kscerrors.KmodReadError("unable to read kmod %s: %s"%(kmod_path, err)) from err
+        if (stat.st_dev, stat.st_ino) in seen:
+            continue
+        seen.add((stat.st_dev, stat.st_ino))
+        digest = kmod_digest(kmod_path)
+        if digest in digests:
+            aliases[digests[digest]].append(kmod_path)
+        else:
+            digests[digest] = kmod_path
+            aliases[kmod_path] = list()
+    return (list(aliases.keys()), aliases)
+
+
+def group_kmods_by_arch(kmods):
+    """
+        split a list of kmods by the architecture they are built for
+        returns a dict of arch (key) to list of kmods (value), kmods whose arch
+        can't be determined are grouped together under None
+    """
+    groups = dict()
+    for k in kmods:
+        groups.setdefault(kmod_arch(k), list()).append(k)
+    return groups
+
+
+def kernels_for_arch(kernels, arch, kmods=()):
+    """
+        pick the kernels to test kmods of arch against, kernel versions ending
+        in another architecture (e.g. 4.18.0-425.3.1.el8.aarch64 for x86_64
+        kmods) are left out, those without an architecture are used for all
+        kmods (as are all kernels if the kmods' arch is unknown)
+        kmods - list - the kmods of arch, named in the error if no kernels are left
+        raises kscerrors.NoKernelsError if there are no kernels for arch
+    """
+    suffixes = tuple("." + a for a in list(ELF_MACHINES.values()) + ["ppc64"])
+    if arch is None:
+        arch_kernels = list(kernels)
+    else:
+        arch_kernels = [k for k in kernels
+                        if k.endswith("." + arch) or not k.endswith(suffixes)]
+    if not arch_kernels:
+        raise kscerrors.NoKernelsError("no kernels given for %s kmods: %s"%(
+            arch, " ".join(os.path.basename(k) for k in kmods)))
+    return arch_kernels
+
+
 def extract_xz_files(raw_ko_files):
     """
     Extract a list of xz compressed files into a temp_dir
@@ -168,54 +486,143 @@ class KscRunner(ksc.Ksc):
                  ko_filepath,
                  releasedir="/lib/modules/kabi-current/",
                  symverdir="/usr/src/kernels/",
+                 stablelist_index=None,
+                 symvers_cache=None,
+                 kmod_aliases=None,
                  ):
         """
             setup ksc to test
+            stablelist_index - StablelistIndex - take the stablelist from this
+                               rather than reading it from releasedir
+            symvers_cache - SymversCache - read kernel symbols through this
+                            cache, which may be shared with other runners
+            kmod_aliases - dict - kmod (key) to paths already found to have the
+                           same contents (value), e.g. by dedupe_kmods before
+                           extraction
         """
 
         self.kernelsymvers = dict()
+        self.symvers_cache = symvers_cache
         self.modinfo = dict()
         super().__init__()
         self.total = None
 
         self.symverdir = symverdir
-        self.kmods = ko_filepath
         self.releasedir = releasedir
-
-        # override the value in utils so we can control the whitelist dir we use
-        utils.WHPATH = ""
-
+        self.stablelist_index = stablelist_index
+
+        # kmods with identical contents are only analysed once, this is the
+        # first path seen with some content (key) to the other paths with
+        # the same content (value)
+        (self.kmods, self.kmod_aliases) = dedupe_kmods(ko_filepath)
+        for (kmod_path, aliases) in (kmod_aliases or dict()).items():
+            if kmod_path in self.kmod_aliases:
+                self.kmod_aliases[kmod_path] += [a for a in aliases if a != kmod_path and
+                                                 a not in self.kmod_aliases[kmod_path]]
         self.find_arch(self.kmods)
 
         self.read_stablelists()
 
+        # symbol (key) to the kmod in the set that exports it (value)
+        self.export_index = dict()
         for kmod_path in self.kmods:
             self.parse_ko(kmod_path, process_stablelists=True)
             self.get_modinfo(kmod_path)
+            for s in self.defined_symbols.get(kmod_path, []):
+                self.export_index.setdefault(s, kmod_path)
 
-        self.remove_internal_symbols()
+        self.resolve_internal_symbols()
+
+    def resolve_internal_symbols(self):
+        """
+            remove the symbols one kmod in the set uses but another exports from
+            the symbols used by it (replaces ksc's remove_internal_symbols),
+            a single pass over the symbols used with lookups in the export_index.
+            the dependencies are kept in kmod_deps as consumer kmod (key) to a
+            dict of provider kmod (key) to list of symbols (value)
+        """
+        self.kmod_deps = dict()
+        for kmod_path in self.all_symbols_used.keys():
+            deps = dict()
+            for s in self.all_symbols_used[kmod_path]:
+                provider = self.export_index.get(s)
+                if provider is not None and provider != kmod_path:
+                    deps.setdefault(provider, list()).append(s)
+            self.kmod_deps[kmod_path] = deps
+
+            if not deps:
+                continue
+            internal = set(s for symbols in deps.values() for s in symbols)
+            for symbols_used in (self.all_symbols_used,
+                                 self.nonstable_symbols_used,
+                                 self.stable_symbols):
+                if kmod_path in symbols_used:
+                    symbols_used[kmod_path] = [s for s in symbols_used[kmod_path]
+                                               if s not in internal]
+
+    def rename_kmods(self, names):
+        """
+            change the paths the kmods are known by, e.g. to give in memory kmods
+            read from /proc/[pid]/fd/[fd] their real names
+            names - dict - the current path (key) to the new name (value)
+            raises kscerrors.KmodReadError if two kmods would have the same name
+        """
+        def rename(path):
+            return names.get(path, path)
+
+        paths = list(self.kmods)
+        for aliases in self.kmod_aliases.values():
+            paths += aliases
+        renamed = collections.Counter(rename(k) for k in paths)
+        duplicates = sorted(name for name, count in renamed.items() if count > 1)
+        if duplicates:
+            raise kscerrors.KmodReadError("more than one kmod is called %s"%(
+                ", ".join(duplicates)))
+
+        self.kmods = [rename(k) for k in self.kmods]
+        for kmod_dict in (self.all_symbols_used, self.nonstable_symbols_used,
+                          self.stable_symbols, self.defined_symbols, self.modinfo):
+            for (old, new) in names.items():
+                if old in kmod_dict:
+                    kmod_dict[new] = kmod_dict.pop(old)
+        self.export_index = {s: rename(k) for s, k in self.export_index.items()}
+        self.kmod_deps = {rename(consumer): {rename(provider): symbols
+                                             for provider, symbols in deps.items()}
+                          for consumer, deps in self.kmod_deps.items()}
+        self.kmod_aliases = {rename(k): [rename(a) for a in aliases]
+                             for k, aliases in self.kmod_aliases.items()}
+        for new in names.values():
+            if new in self.modinfo:
+                self.modinfo[new]['filename'] = new
 
     def sanity_check_kmods(self):
         """
             perform sanity checks on the kmods passed
             mostly that they are all compiled for the same kernel version
-            if not we're going to get into a mess so just exit with an error.
+            if not we're going to get into a mess so raise an error.
         """
         last = None
         for k in self.all_symbols_used.keys():
             kmod_kernel_version = self.modinfo[k]["vermagic"].split(" ")[0]
             if last is not None and kmod_kernel_version != last:
-                print("kmods are compiled for differnet kernels! %s != %s"%(
-                    last, kmod_kernel_version))
-                sys.exit(2)
+                raise kscerrors.KmodMismatchError(
+                    "kmods are compiled for differnet kernels! %s != %s"%(
+                        last, kmod_kernel_version))
+            last = kmod_kernel_version
 
 
-    def generate_ksc(self, test_kernel_version):
+    def generate_ksc(self, test_kernel_version, symvers=None):
         """
             read in the kernel symbols and generate the reresult object
+            symvers - SymversTable - the already read symbols of test_kernel_version
+                             (e.g. from a SymversPrefetcher), read them if None.
+                             these are not cached so the runner does not keep
+                             every prefetched kernel alive
         """
-        if test_kernel_version not in self.kernelsymvers:
-            self.kernelsymvers[test_kernel_version] = self.read_symvers(test_kernel_version)
+        if symvers is None:
+            if test_kernel_version not in self.kernelsymvers:
+                self.kernelsymvers[test_kernel_version] = self.read_symvers(test_kernel_version)
+            symvers = self.kernelsymvers[test_kernel_version]
 
         #all the kmods have the same vermagic or sanity_check failed
         kmod_kernel_version = self.modinfo[self.kmods[0]]["vermagic"].split(" ")[0]
@@ -225,11 +632,13 @@ class KscRunner(ksc.Ksc):
 
         res = kscresult.KscResult(
             test_kernel_version,
-            self.kernelsymvers[test_kernel_version],
+            symvers,
             self.kernelsymvers[kmod_kernel_version],
             self.modinfo,
             self.nonstable_symbols_used,
-            self.stable_symbols
+            self.stable_symbols,
+            self.kmod_deps,
+            self.kmod_aliases
             )
 
         return res
@@ -264,29 +673,29 @@ class KscRunner(ksc.Ksc):
                         self.modinfo[path][data[0]] = data[1].strip()
                     prevkey = data[0]
         except Exception as err:
-            print("get_modinfo failed: %s"%err)
-            sys.exit(1)
+            raise kscerrors.ModinfoError("get_modinfo failed: %s"%err) from err
+
+
+    def symvers_file(self, kernelversion):
+        """
+            get the path to the (possibly compressed) Module.symvers file of a kernel
+        """
+        return kscsymvers.find_symvers(self.symverdir, kernelversion)
 
 
     def read_symvers(self, kernelversion):
         """
             read the list of symbols in the kernel
         """
-        symverfile = os.path.join(self.symverdir, kernelversion, "Module.symvers")
-
-        result = dict()
         try:
-            with open(symverfile, "r") as fptr:
-                for line in fptr.readlines():
-                    if line.startswith("["):
-                        continue
-                    fields = line.split()
-                    result[fields[1]] = fields[0]
-        except IOError as err:
-            print(err)
-            print("Missing all symbol list")
-            print("Do you have the kernel-devel package installed?")
-            sys.exit(1)
+            if self.symvers_cache is not None:
+                result = self.symvers_cache.read_symvers(self.symverdir, kernelversion)
+            else:
+                result = kscsymvers.read_symvers(self.symverdir, kernelversion)
+        except kscsymvers.SYMVERS_ERRORS as err:
+            raise kscerrors.SymversMissingError(
+                "%s\nMissing all symbol list\n"
+                "Do you have the kernel-devel package installed?"%err) from err
         return result
 
 
@@ -294,14 +703,159 @@ class KscRunner(ksc.Ksc):
         """
             read in the list of stable abi symbols
         """
-        self.matchdata, exists = utils.read_list(self.arch, self.releasedir, self.verbose)
+        if self.stablelist_index is not None:
+            self.matchdata = self.stablelist_index.get(self.releasedir, self.arch)
+            exists = self.matchdata is not None
+        else:
+            self.matchdata, exists = utils.read_list(self.arch, self.releasedir, self.verbose)
         if not exists:
-            print("stablelist missing")
-            sys.exit(12)
+            raise kscerrors.StablelistMissingError("stablelist missing")
 
         return exists
 
 
+class FailureBudget():
+    """
+        the count of failing kmod/kernel pairs in --gate mode, shared by the
+        threads testing each architecture so --max-failures applies to the
+        whole run rather than to each architecture
+        max_failures - int - the number of failures allowed before testing stops
+    """
+    def __init__(self, max_failures):
+        """
+            setup the count
+        """
+        self.max_failures = max_failures
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def add(self, failures):
+        """
+            count more failures
+            returns True if the budget is now exceeded
+        """
+        with self._lock:
+            self.failures += failures
+            return self.failures > self.max_failures
+
+    def exceeded(self):
+        """
+            have more than max_failures failures been counted
+        """
+        with self._lock:
+            return self.failures > self.max_failures
+
+
+class SymversPrefetcher():
+    """
+        read the Module.symvers of a list of kernels in a background thread so
+        that reading the next kernels overlaps with classifying the current one.
+        iterating over it yields (kernelversion, symvers) in the order given.
+        runner - KscRunner - used to locate and read the symvers files
+        kernels - list - the kernel versions to read
+        readahead - int - the maximum number of read but unconsumed kernels
+        max_bytes - int - the maximum total file size of read but unconsumed
+                          kernels (None for no limit), a single kernel larger
+                          than this is still read once the queue is empty
+    """
+    def __init__(self, runner, kernels, readahead=2, max_bytes=None):
+        """
+            setup the queue and start the reader thread
+        """
+        self.runner = runner
+        self.kernels = list(kernels)
+        self.readahead = max(readahead, 1)
+        self.max_bytes = max_bytes
+
+        self._cond = threading.Condition()
+        self._queue = collections.deque()
+        self._queued_bytes = 0
+        self._done = False
+        self._stopped = False
+        self._error = None
+
+        self._thread = threading.Thread(target=self._read_kernels, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _full(self, size):
+        """
+            is there no room in the queue for a file of size bytes
+            must be called with self._cond held
+        """
+        if not self._queue:
+            return False
+        if len(self._queue) >= self.readahead:
+            return True
+        return self.max_bytes is not None and self._queued_bytes + size > self.max_bytes
+
+    def _read_kernels(self):
+        """
+            reader thread, read each kernels symvers as space in the queue allows
+        """
+        try:
+            for k in self.kernels:
+                try:
+                    size = os.path.getsize(self.runner.symvers_file(k))
+                except OSError:
+                    # let read_symvers report the missing file
+                    size = 0
+
+                with self._cond:
+                    while self._full(size) and not self._stopped:
+                        self._cond.wait()
+                    if self._stopped:
+                        return
+
+                symvers = self.runner.read_symvers(k)
+
+                with self._cond:
+                    self._queue.append((k, symvers, size))
+                    self._queued_bytes += size
+                    self._cond.notify_all()
+        # hand anything at all back to the consumer to raise
+        except BaseException as err: # pylint: disable=broad-except
+            with self._cond:
+                self._error = err
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+    def __iter__(self):
+        """
+            yield (kernelversion, symvers) as the reader thread produces them
+        """
+        while True:
+            with self._cond:
+                while not self._queue and not self._done:
+                    self._cond.wait()
+                if not self._queue:
+                    if self._error is not None:
+                        raise self._error
+                    return
+                (k, symvers, size) = self._queue.popleft()
+                self._queued_bytes -= size
+                self._cond.notify_all()
+            yield (k, symvers)
+
+    def close(self):
+        """
+            stop reading ahead and wait for the reader thread to finish
+        """
+        with self._cond:
+            self._stopped = True
+            self._queue.clear()
+            self._queued_bytes = 0
+            self._cond.notify_all()
+        self._thread.join()
+
+
 if __name__ == '__main__':
     main()
     sys.exit(0)
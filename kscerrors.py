@@ -0,0 +1,52 @@
+"""
+    exceptions raised when ksc_reporter can't test a set of kmods
+"""
+
+class KscReporterError(Exception):
+    """
+        base class of all ksc_reporter errors
+        exit_code - int - the exit status the command line uses for the error
+    """
+    exit_code = 1
+
+
+class SymversMissingError(KscReporterError):
+    """
+        the Module.symvers of a kernel could not be read
+    """
+    exit_code = 1
+
+
+class KmodReadError(KscReporterError):
+    """
+        a kmod could not be read or decompressed
+    """
+    exit_code = 1
+
+
+class ModinfoError(KscReporterError):
+    """
+        modinfo could not be run on a kmod
+    """
+    exit_code = 1
+
+
+class KmodMismatchError(KscReporterError):
+    """
+        the kmods in a set are compiled for different kernels
+    """
+    exit_code = 2
+
+
+class NoKernelsError(KscReporterError):
+    """
+        none of the kernels given can be used to test kmods of an architecture
+    """
+    exit_code = 1
+
+
+class StablelistMissingError(KscReporterError):
+    """
+        there is no stablelist for the arch in the release directory
+    """
+    exit_code = 12
@@ -1,5 +1,7 @@
 import os
 import re
+import threading
+import collections
 import yaml
 
 class KscReport():
@@ -12,15 +14,17 @@ class KscReport():
             results - list of kscresult objects
         """
         self.kscs = list()
+        self._lock = threading.Lock()
         if results is not None:
             self.kscs += results
 
 
     def add_ksc(self, ksc_result):
         """
-        add a kscresult object to the list
+        add a kscresult object to the list, this may be called from several threads
         """
-        self.kscs.append(ksc_result)
+        with self._lock:
+            self.kscs.append(ksc_result)
 
 
     def report_summary_yaml(self, filename=None, overwrite=False):
@@ -34,12 +38,14 @@ class KscReport():
         report = dict()
         for r in self.kscs:
             report[r.kernelversion] = dict()
+            names = kmod_names(r)
             for k in r.kmods:
-                name = os.path.basename(k)
+                name = names[k]
                 report[r.kernelversion][name] = {'stable': len(r.get_all_stable_symbols(k)),
                                                  'unstable':len(r.get_all_unstable_symbols(k)),
                                                  'unknown': len(r.get_unknown_stable_symbols(k)+
                                                                 r.get_unknown_unstable_symbols(k))}
+                add_aliases(report[r.kernelversion], r, k, names)
         if filename:
             self.write_yaml_file(report, filename, overwrite)
         return yaml.dump(report, default_flow_style=False)
@@ -61,9 +67,9 @@ class KscReport():
                    len(k.get_unknown_unstable_symbols(ko_file)) > 0 or \
                    len(k.get_changed_unstable_symbols(ko_file)) > 0 or \
                    len(k.get_changed_stable_symbols(ko_file)) > 0:
-                    changed += 1
+                    changed += k.kmod_copies(ko_file)
                 else:
-                    unchanged += 1
+                    unchanged += k.kmod_copies(ko_file)
 
             report[k.kernelversion] = {'changed': changed, 'unchanged': unchanged}
 
@@ -83,10 +89,11 @@ class KscReport():
         for k in sorted(self.kscs, key=kernel_key):
             changed = 0
             for ko_file in k.kmods:
-                changed += len(k.get_unknown_stable_symbols(ko_file)) +\
-                          len(k.get_unknown_unstable_symbols(ko_file)) +\
-                          len(k.get_changed_unstable_symbols(ko_file)) +\
-                          len(k.get_changed_stable_symbols(ko_file))
+                changed += k.kmod_copies(ko_file) * (
+                    len(k.get_unknown_stable_symbols(ko_file)) +
+                    len(k.get_unknown_unstable_symbols(ko_file)) +
+                    len(k.get_changed_unstable_symbols(ko_file)) +
+                    len(k.get_changed_stable_symbols(ko_file)))
             report += "%s,%s\n"%(k.kernelversion, changed)
 
         if filename:
@@ -104,8 +111,9 @@ class KscReport():
         report = dict()
         for k in self.kscs:
             report[k.kernelversion] = dict()
+            names = kmod_names(k)
             for ko_file in k.kmods:
-                ko_name = os.path.basename(ko_file)
+                ko_name = names[ko_file]
                 report[k.kernelversion][ko_name] = {
                     'stable': {'unchanged': len(k.get_unchanged_stable_symbols(ko_file)),
                                'changed': len(k.get_changed_stable_symbols(ko_file))},
@@ -113,6 +121,7 @@ class KscReport():
                                  'changed': len(k.get_changed_unstable_symbols(ko_file))},
                     'unknown': len(k.get_unknown_stable_symbols(ko_file)
                                    +k.get_unknown_stable_symbols(ko_file))}
+                add_aliases(report[k.kernelversion], k, ko_file, names)
 
         if filename:
             self.write_yaml_file(report, filename, overwrite)
@@ -132,8 +141,9 @@ class KscReport():
         for k in self.kscs:
             report[k.kernelversion] = dict()
             #report[k.kernelversion] = list()
+            names = kmod_names(k)
             for ko_file in k.kmods:
-                kmod = {"kmod_name": os.path.basename(ko_file),
+                kmod = {"kmod_name": names[ko_file],
                         "version": k.modinfo[ko_file]['vermagic'].strip()}
 
                 if 'import_ns' in k.modinfo[ko_file].keys():
@@ -147,8 +157,22 @@ class KscReport():
                     'unknown': sorted(k.get_unknown_stable_symbols(ko_file)
                                       +k.get_unknown_stable_symbols(ko_file))}
 
+                providers = k.get_kmod_providers(ko_file)
+                if providers:
+                    kmod['uses'] = {names.get(p, p): sorted(syms)
+                                    for p, syms in providers.items()}
+                consumers = k.get_kmod_consumers(ko_file)
+                if consumers:
+                    kmod['used_by'] = {names.get(c, c): sorted(syms)
+                                       for c, syms in consumers.items()}
+
+                aliases = k.get_kmod_aliases(ko_file)
+                if aliases:
+                    kmod['aliases'] = list(aliases)
+
                 kmod['modinfo'] = k.modinfo[ko_file].copy()
-                report[k.kernelversion][os.path.basename(ko_file)] = kmod
+                report[k.kernelversion][names[ko_file]] = kmod
+                add_aliases(report[k.kernelversion], k, ko_file, names)
                 #report[k.kernelversion].append(kmod)
 
         if filename:
@@ -156,6 +180,94 @@ class KscReport():
 
         return yaml.dump(report, default_flow_style=False)
 
+    def report_delta_yaml(self, filename=None, overwrite=False):
+        """
+        generate a yaml report that walks the kernels in version order, giving the
+        full classification of the symbols used by each kmod for the first kernel
+        and after that only the symbols whose classification has changed since
+        the previous kernel. consecutive kernels with identical classifications
+        are grouped into a single range. results for different sets of kmods
+        (e.g. different architectures) are walked separately
+        args:
+          filename - string - if given write it out to that file as well as returning it
+          overwrite - bool - if True truncate the file (otherwise append to it)
+        """
+        kmod_sets = dict()
+        for k in self.kscs:
+            kmod_sets.setdefault(tuple(sorted(k.kmods)), list()).append(k)
+
+        report = list()
+        for results in kmod_sets.values():
+            previous = None
+            for k in sorted(results, key=kernel_key):
+                states = symbol_states(k)
+                if states == previous:
+                    report[-1]['kernels']['last'] = k.kernelversion
+                    report[-1]['kernels']['count'] += 1
+                    continue
+
+                entry = {'kernels': {'first': k.kernelversion,
+                                     'last': k.kernelversion,
+                                     'count': 1}}
+                if previous is None:
+                    entry['kmods'] = dict()
+                    names = kmod_names(k)
+                    for ko_file in k.kmods:
+                        symbols = {
+                            'stable': {
+                                'unchanged': sorted(k.get_unchanged_stable_symbols(ko_file)),
+                                'changed': sorted(k.get_changed_stable_symbols(ko_file))},
+                            'unstable': {
+                                'unchanged': sorted(k.get_unchanged_unstable_symbols(ko_file)),
+                                'changed': sorted(k.get_changed_unstable_symbols(ko_file))},
+                            'unknown': sorted(k.get_unknown_stable_symbols(ko_file)
+                                              +k.get_unknown_unstable_symbols(ko_file))}
+                        entry['kmods'][names[ko_file]] = {
+                            'symbols': symbols,
+                            'modinfo': k.modinfo[ko_file].copy()}
+                        add_aliases(entry['kmods'], k, ko_file, names)
+                else:
+                    entry['changes'] = dict()
+                    for name, symbols in states.items():
+                        moved = {sym: "%s -> %s"%(previous[name].get(sym), state)
+                                 for sym, state in symbols.items()
+                                 if previous[name].get(sym) != state}
+                        if moved:
+                            entry['changes'][name] = moved
+
+                report.append(entry)
+                previous = states
+
+        if filename:
+            self.write_yaml_file(report, filename, overwrite)
+
+        return yaml.dump(report, default_flow_style=False)
+
+    def report_gate(self, filename=None, overwrite=False):
+        """
+        generate a compact pass/fail verdict table from the kscresults
+        a kmod fails against a kernel as soon as one symbol it uses is
+        changed or unknown, the first such symbol is shown
+        args:
+          filename - string - if given write it out to that file as well as returning it
+          overwrite - bool - if True truncate the file (otherwise append to it)
+        """
+        report = "%-40s %-30s %-7s %s\n"%("kernel", "kmod", "verdict", "symbol")
+        for k in sorted(self.kscs, key=kernel_key):
+            names = kmod_names(k)
+            for ko_file in k.kmods:
+                symbol = k.first_failing_symbol(ko_file)
+                for path in [ko_file] + k.get_kmod_aliases(ko_file):
+                    report += "%-40s %-30s %-7s %s\n"%(k.kernelversion,
+                                                        names[path],
+                                                        "PASS" if symbol is None else "FAIL",
+                                                        symbol or "")
+
+        if filename:
+            self.write_file(report, filename, overwrite)
+        return report
+
+
     def write_file(self, report, filename, overwrite):
         output_filename = self.prepare_file(filename, overwrite)
         with open(output_filename, "a") as f:
@@ -191,6 +303,75 @@ class KscReport():
 
 
 
+def kmod_names(kernel):
+    """
+        get a unique name to report each kmod (and alias) in a kscresult as,
+        this is its basename without any .xz suffix unless several kmods share
+        it (e.g. copies in different kernel version directories) in which case
+        enough of the end of their paths is used to tell them apart, falling
+        back to the full path given
+        returns a dict of path (key) to name (value)
+    """
+    pending = list(kernel.kmods)
+    for ko_file in kernel.kmods:
+        pending += kernel.get_kmod_aliases(ko_file)
+
+    names = dict()
+    depth = 1
+    while pending:
+        candidates = dict()
+        for path in pending:
+            parts = os.path.normpath(path[:-3] if path.endswith(".xz") else path).split(os.sep)
+            candidates[path] = os.path.join(*parts[-depth:]) if depth <= len(parts) else path
+        counts = collections.Counter(candidates.values())
+        remaining = list()
+        for path, name in candidates.items():
+            if counts[name] == 1 or name == path:
+                names[path] = name
+            else:
+                remaining.append(path)
+        pending = remaining
+        depth += 1
+    return names
+
+
+def add_aliases(kmods_report, kernel, ko_file, names):
+    """
+        add an entry for each kmod identical to ko_file to a report's dict of
+        kmod name (key) to results (value), naming the alias and the path
+        of the kmod whose results it shares
+        names - dict - the kmod names from kmod_names
+    """
+    for alias in kernel.get_kmod_aliases(ko_file):
+        kmods_report[names[alias]] = {'path': alias, 'alias_of': ko_file}
+
+
+def symbol_states(kernel):
+    """
+        get the classification of every symbol used by each kmod in a kscresult
+        as a dict of kmod name (key) to a dict of symbol (key) to one of
+        stable/changed, stable/unchanged, unstable/changed, unstable/unchanged
+        or unknown (value)
+    """
+    states = dict()
+    names = kmod_names(kernel)
+    for ko_file in kernel.kmods:
+        kmod = dict()
+        for s in kernel.get_changed_stable_symbols(ko_file):
+            kmod[s] = 'stable/changed'
+        for s in kernel.get_unchanged_stable_symbols(ko_file):
+            kmod[s] = 'stable/unchanged'
+        for s in kernel.get_changed_unstable_symbols(ko_file):
+            kmod[s] = 'unstable/changed'
+        for s in kernel.get_unchanged_unstable_symbols(ko_file):
+            kmod[s] = 'unstable/unchanged'
+        for s in kernel.get_unknown_stable_symbols(ko_file) + \
+                 kernel.get_unknown_unstable_symbols(ko_file):
+            kmod[s] = 'unknown'
+        states[names[ko_file]] = kmod
+    return states
+
+
 def kernel_key(kernel):
     """
         turn a kernel version into a string that can then be sorted on
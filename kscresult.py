@@ -5,14 +5,18 @@ class KscResult():
     """
         a set of results from ksc that can generate reports
         kernelversion - the kernel ersion to test (e.g. 4.18.0-425.3.1.el8.x86_64)
-        symvers_tested - dict - the symbols(key) and crc (value) of all the symbols
-                                in the kernel to test against
-        symvers_compiled - dict - the symbol versions in the lernelthe kmod is compiled against
+        symvers_tested - mapping - the symbols(key) and crc (value) of all the symbols
+                                   in the kernel to test against (e.g. a SymversTable)
+        symvers_compiled - mapping - the symbol versions in the lernelthe kmod is compiled against
         modinfo - dict - the output of modinfo [kmod] as a dict
         nonstable_symbols_used - dict - the symbols used in the kmod (key)
                                         not in the whitelist as a list(value)
         stable_symbols_used - dict - the symbols used in the kmod (key)
                                      that are in the whitelist as a list(value)
+        kmod_deps - dict - the kmod (key) to a dict of the other kmods in the set
+                           it uses symbols from (key) and those symbols (value)
+        kmod_aliases - dict - the kmod (key) to a list of other paths to kmods
+                              with identical contents that share its results
         kmods - list - the kmods used
     """
     def __init__(self,
@@ -21,7 +25,9 @@ class KscResult():
                  symvers_compiled,
                  modinfo,
                  nonstable_symbols_used,
-                 stable_symbols_used):
+                 stable_symbols_used,
+                 kmod_deps=None,
+                 kmod_aliases=None):
 
         """
             setup the object
@@ -32,6 +38,12 @@ class KscResult():
         self.modinfo = modinfo
         self.nonstable_symbols_used = nonstable_symbols_used
         self.stable_symbols_used = stable_symbols_used
+        self.kmod_deps = kmod_deps if kmod_deps is not None else dict()
+        self.kmod_aliases = kmod_aliases if kmod_aliases is not None else dict()
+        self._kmod_consumers = dict()
+        for consumer, deps in self.kmod_deps.items():
+            for provider, symbols in deps.items():
+                self._kmod_consumers.setdefault(provider, dict())[consumer] = symbols
         ## not clear if we want/need this so leaving it here for future reference
         ## self.import_ns = modinfo['import_ns']
 
@@ -42,6 +54,7 @@ class KscResult():
         self._unstable_symbols = dict()
         self._changed_symbols = dict()
         self._unchanged_symbols = dict()
+        self._first_failure = dict()
 
         #self._stable_symbols_all = dict()
         #self._unstable_symbols_all = dict()
@@ -54,6 +67,33 @@ class KscResult():
         return self.kmods
 
 
+    def get_kmod_aliases(self, ko_file):
+        """
+            get the other paths to kmods identical to this one, which share its results
+        """
+        return self.kmod_aliases.get(ko_file, list())
+
+    def kmod_copies(self, ko_file):
+        """
+            get the number of paths given for this kmod, itself and its aliases
+        """
+        return 1 + len(self.get_kmod_aliases(ko_file))
+
+    def get_kmod_providers(self, ko_file):
+        """
+            get the other kmods in the set that this kmod uses symbols from
+            as a dict of kmod (key) to list of symbols (value)
+        """
+        return self.kmod_deps.get(ko_file, dict())
+
+    def get_kmod_consumers(self, ko_file):
+        """
+            get the other kmods in the set that use symbols exported by this kmod
+            as a dict of kmod (key) to list of symbols (value)
+        """
+        return self._kmod_consumers.get(ko_file, dict())
+
+
 #    def get_stable_symbols(self, ko_file):
 #        """
 #            get the symbols used that are in the Red Hat whitelist (and so can be relied on)
@@ -82,6 +122,62 @@ class KscResult():
 #        return self._unknown_symbols_all[ko_file]
 #
 
+    def classify(self):
+        """
+            classify the stable and unstable symbols of every kmod now rather
+            than when a report first asks for them
+        """
+        for ko_file in self.kmods:
+            self.classify_stable_symbols(ko_file)
+            self.classify_unstable_symbols(ko_file)
+
+
+    def release_symvers(self):
+        """
+            drop the symbols of the tested kernel, once the kmods have been
+            classified (or checked with first_failing_symbol) the results don't
+            need them and a run over many kernels needn't hold every kernel's
+            symbols until the report is written. the first failing symbol of
+            each kmod is found first so the gate report can still be written,
+            the classify_* methods must already have been called for any
+            other report
+        """
+        self.get_failed_kmods()
+        self.symvers_tested = None
+        self.total = None
+
+
+    def first_failing_symbol(self, ko_file):
+        """
+            find the first symbol used by a kmod that is either unknown in the
+            tested against kernel or whose crc has changed since the kernel the
+            kmod was built for. unlike the classify_* methods this stops at the
+            first failure so it is cheap enough for a pass/fail check
+            ko_file - string - the path to the kmod to be checked
+            returns the symbol name or None if the kmod passes
+        """
+        if ko_file not in self._first_failure.keys():
+            self._first_failure[ko_file] = None
+            for symbols in (self.stable_symbols_used[ko_file],
+                            self.nonstable_symbols_used[ko_file]):
+                for s in symbols:
+                    crc = self.symvers_tested.get(s)
+                    if crc is None or crc != self.symvers_compiled.get(s):
+                        self._first_failure[ko_file] = s
+                        break
+                if self._first_failure[ko_file] is not None:
+                    break
+
+        return self._first_failure[ko_file]
+
+
+    def get_failed_kmods(self):
+        """
+            get the list of kmods that use at least one changed or unknown symbol
+        """
+        return [k for k in self.kmods if self.first_failing_symbol(k) is not None]
+
+
     def classify_unstable_symbols(self, ko_file):
         """
             sort the unstable (non-whitelisted) symbols used for a kmod
@@ -97,12 +193,13 @@ class KscResult():
                                                }
 
             for s in self.nonstable_symbols_used[ko_file]:
-                if s in self.total:
-                    self._unstable_symbols[ko_file]['all'].append(s)
-
-                if s not in self.symvers_tested:
+                crc = self.symvers_tested.get(s)
+                if crc is None:
                     self._unstable_symbols[ko_file]['unknown'].append(s)
-                elif self.symvers_tested[s] != self.symvers_compiled[s]:
+                    continue
+
+                self._unstable_symbols[ko_file]['all'].append(s)
+                if crc != self.symvers_compiled.get(s):
                     self._unstable_symbols[ko_file]['changed'].append(s)
                 else:
                     self._unstable_symbols[ko_file]['unchanged'].append(s)
@@ -160,12 +257,13 @@ class KscResult():
                                             }
 
             for s in self.stable_symbols_used[ko_file]:
-                if s in self.total:
-                    self._stable_symbols[ko_file]['all'].append(s)
-
-                if s not in self.symvers_tested:
+                crc = self.symvers_tested.get(s)
+                if crc is None:
                     self._stable_symbols[ko_file]['unknown'].append(s)
-                elif self.symvers_tested[s] != self.symvers_compiled[s]:
+                    continue
+
+                self._stable_symbols[ko_file]['all'].append(s)
+                if crc != self.symvers_compiled.get(s):
                     self._stable_symbols[ko_file]['changed'].append(s)
                 else:
                     self._stable_symbols[ko_file]['unchanged'].append(s)
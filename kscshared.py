@@ -0,0 +1,244 @@
+"""
+    symvers and stablelist tables held in shared memory so worker processes
+    can use them without each having their own copy
+"""
+import array
+import zlib
+import collections.abc
+from multiprocessing import shared_memory
+
+# every field in a shared table is a native 32 bit unsigned int
+ITEMSIZE = array.array("I").itemsize
+
+
+def _attach_block(name):
+    """
+        attach to an existing shared memory block without this process taking
+        ownership of it (so it isn't unlinked when this process exits)
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # python < 3.13 always registers the block with the resource tracker,
+        # worker processes share their parent's tracker so this is harmless
+        return shared_memory.SharedMemory(name=name)
+
+
+class _SharedNames(collections.abc.Sequence):
+    """
+        the sorted symbol names of a shared table, decoded as they are accessed
+        offsets - memoryview - the start of each name in blob and the end of the last
+        blob - memoryview - the utf-8 encoded names one after another
+    """
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return str(self._blob[self._offsets[i]:self._offsets[i+1]], "utf-8")
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+
+class SharedSymversTable(collections.abc.Mapping):
+    """
+        a mapping of symbol name to crc like a SymversTable whose names and
+        crcs live in a multiprocessing shared memory block, read in place by
+        every process attached to it.
+        pickling one (e.g. to send it to a worker process) only sends the name
+        of the block, the worker attaches to it rather than getting a copy.
+        the block holds, all as 32 bit ints: the number of symbols, the number
+        of hash slots, each crc, the offset of each name (plus the end of the
+        last), the hash slots and then the names.
+        each hash slot is 0 or 1 + the position of a name, a name is found by
+        probing from the slot its crc32 picks, comparing the encoded names in
+        place so a lookup doesn't decode any of them
+        the process that creates a table must unlink() it once all the workers
+        are finished with it
+        block - SharedMemory - the block holding the table
+    """
+    def __init__(self, block):
+        """
+            setup read only views of the block
+        """
+        self.block = block
+        buf = block.buf.toreadonly()
+        (count, nslots) = buf[:2*ITEMSIZE].cast("I")
+        crcs_end = ITEMSIZE * (2 + count)
+        offsets_end = crcs_end + ITEMSIZE * (count + 1)
+        slots_end = offsets_end + ITEMSIZE * nslots
+
+        self._views = [buf,
+                       buf[2*ITEMSIZE:crcs_end].cast("I"),
+                       buf[crcs_end:offsets_end].cast("I"),
+                       buf[offsets_end:slots_end].cast("I"),
+                       buf[slots_end:]]
+        (self._crcs, self._offsets, self._slots, self._blob) = self._views[1:]
+        self._names = _SharedNames(self._offsets, self._blob)
+
+    @classmethod
+    def create(cls, table):
+        """
+            copy a mapping of symbol name to crc (e.g. a SymversTable) into a
+            new shared memory block
+        """
+        entries = sorted((name.encode(), crc) for name, crc in table.items())
+        offsets = array.array("I", [0])
+        for (name, crc) in entries:
+            offsets.append(offsets[-1] + len(name))
+
+        # at most half the slots are used so probes stay short
+        nslots = 1
+        while nslots < 2 * len(entries):
+            nslots *= 2
+        slots = array.array("I", bytes(ITEMSIZE * nslots))
+        for i, (name, crc) in enumerate(entries):
+            slot = zlib.crc32(name) & (nslots - 1)
+            while slots[slot]:
+                slot = (slot + 1) & (nslots - 1)
+            slots[slot] = i + 1
+
+        header = array.array("I", [len(entries), nslots])
+        crcs = array.array("I", [crc for (name, crc) in entries])
+        size = ITEMSIZE * (len(header) + len(crcs) + len(offsets) + nslots) + offsets[-1]
+
+        block = shared_memory.SharedMemory(create=True, size=size)
+        pos = 0
+        for data in (header.tobytes(), crcs.tobytes(), offsets.tobytes(), slots.tobytes(),
+                     b"".join(name for (name, crc) in entries)):
+            block.buf[pos:pos+len(data)] = data
+            pos += len(data)
+        return cls(block)
+
+    @classmethod
+    def attach(cls, name):
+        """
+            attach to the table in the shared memory block called name
+        """
+        return cls(_attach_block(name))
+
+    def _index(self, name):
+        """
+            get the position of name in the table or -1 if it isn't there
+        """
+        if not isinstance(name, str):
+            return -1
+        key = name.encode()
+        mask = len(self._slots) - 1
+        slot = zlib.crc32(key) & mask
+        while self._slots[slot]:
+            i = self._slots[slot] - 1
+            if self._blob[self._offsets[i]:self._offsets[i+1]] == key:
+                return i
+            slot = (slot + 1) & mask
+        return -1
+
+    def get(self, name, default=None):
+        i = self._index(name)
+        if i < 0:
+            return default
+        return self._crcs[i]
+
+    def __getitem__(self, name):
+        i = self._index(name)
+        if i < 0:
+            raise KeyError(name)
+        return self._crcs[i]
+
+    def __contains__(self, name):
+        return self._index(name) >= 0
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __reduce__(self):
+        return (self.__class__.attach, (self.block.name,))
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        """
+            detach this process from the table
+        """
+        # _views is unset if __init__ failed before creating it
+        if not getattr(self, "_views", None):
+            return
+        for view in reversed(self._views):
+            view.release()
+        self._views = list()
+        self.block.close()
+
+    def unlink(self):
+        """
+            detach from the table and free the shared memory, only the creator
+            should call this
+        """
+        self.close()
+        self.block.unlink()
+
+
+class SharedSymbolSet(collections.abc.Set):
+    """
+        a read only set of symbol names (e.g. a stablelist) in shared memory,
+        stored as a SharedSymversTable with every crc 0
+        table - SharedSymversTable - the table holding the names
+    """
+    def __init__(self, table):
+        self.table = table
+
+    @classmethod
+    def create(cls, symbols):
+        """
+            copy a set of symbol names into a new shared memory block
+        """
+        return cls(SharedSymversTable.create(dict.fromkeys(symbols, 0)))
+
+    @classmethod
+    def attach(cls, name):
+        """
+            attach to the set in the shared memory block called name
+        """
+        return cls(SharedSymversTable.attach(name))
+
+    def __reduce__(self):
+        return (self.__class__.attach, (self.table.block.name,))
+
+    def __contains__(self, name):
+        return name in self.table
+
+    def __iter__(self):
+        return iter(self.table)
+
+    def __len__(self):
+        return len(self.table)
+
+    def close(self):
+        """
+            detach this process from the set
+        """
+        self.table.close()
+
+    def unlink(self):
+        """
+            detach from the set and free the shared memory, only the creator
+            should call this
+        """
+        self.table.unlink()
+
+
+def share_symvers(kernelsymvers):
+    """
+        copy a dict of kernel version (key) to symbols (value), such as
+        KscRunner.kernelsymvers, into shared memory
+        returns a dict of kernel version (key) to SharedSymversTable (value)
+    """
+    return {k: SharedSymversTable.create(symvers) for k, symvers in kernelsymvers.items()}
@@ -0,0 +1,189 @@
+"""
+    a precompiled index of the kernel abi stablelists of every arch
+"""
+import os
+import hashlib
+import json
+import tempfile
+
+import kscshared
+
+ARCHES = ("x86_64", "aarch64", "ppc64le", "s390x")
+
+# older releases call the stablelists whitelists
+STABLELIST_PREFIXES = ("kabi_stablelist_", "kabi_whitelist_")
+
+# indexes already loaded in this process, tuple of releasedirs (key) to index (value)
+_LOADED = dict()
+
+DEFAULT_CACHE = os.path.join(os.environ.get("XDG_CACHE_HOME", "~/.cache"),
+                             "ksc_reporter", "stablelists.json")
+
+
+def release_name(releasedir):
+    """
+        get the name of the release a stablelist directory is for, symlinks
+        are followed so /lib/modules/kabi-current/ gives e.g. kabi-rhel90
+    """
+    return os.path.basename(os.path.realpath(releasedir))
+
+
+def find_stablelists(releasedirs):
+    """
+        find the stablelist file for each arch in each release directory
+        returns a list of (release, arch, path) tuples
+    """
+    found = list()
+    for releasedir in releasedirs:
+        for arch in ARCHES:
+            for prefix in STABLELIST_PREFIXES:
+                path = os.path.join(releasedir, prefix + arch)
+                if os.path.isfile(path):
+                    found.append((release_name(releasedir), arch, os.path.realpath(path)))
+                    break
+    return found
+
+
+def fingerprint(stablelists):
+    """
+        hash the path, size and modification time of the stablelist files
+        so a cached index can be checked without reading them
+        stablelists - list - (release, arch, path) tuples as from find_stablelists
+    """
+    digest = hashlib.sha256()
+    for (release, arch, path) in sorted(stablelists):
+        stat = os.stat(path)
+        digest.update(("%s %s %s %d %d\n"%(release, arch, path,
+                                            stat.st_size, stat.st_mtime_ns)).encode())
+    return digest.hexdigest()
+
+
+def read_stablelist(path):
+    """
+        read a stablelist file
+        returns a frozenset of the symbols in it
+    """
+    result = set()
+    with open(path) as fptr:
+        for line in fptr:
+            if line.startswith("["):
+                continue
+            symbol = line.strip("\n\t")
+            if symbol:
+                result.add(symbol)
+    return frozenset(result)
+
+
+def clear_cache():
+    """
+        drop the indexes kept in memory by StablelistIndex.load
+    """
+    _LOADED.clear()
+
+
+class StablelistIndex():
+    """
+        the stable symbols of each (release, arch) pair as a hashed set
+        fingerprint - string - the fingerprint of the files the index was built from
+        stablelists - dict - (release, arch) (key) to a frozenset of symbols (value)
+    """
+    def __init__(self, fingerprint_, stablelists):
+        """
+            setup the index
+        """
+        self.fingerprint = fingerprint_
+        self.stablelists = stablelists
+
+    @classmethod
+    def build(cls, releasedirs):
+        """
+            read every arches stablelist in each of releasedirs
+        """
+        found = find_stablelists(releasedirs)
+        stablelists = dict()
+        for (release, arch, path) in found:
+            stablelists[(release, arch)] = read_stablelist(path)
+        return cls(fingerprint(found), stablelists)
+
+    @classmethod
+    def load(cls, releasedirs, cachefile=DEFAULT_CACHE):
+        """
+            get the index for releasedirs from cachefile, if it is missing or was
+            built from different files then build it and save it to cachefile.
+            indexes loaded are also kept in memory and reused by later calls
+            while the stablelists are unchanged
+            cachefile - string - where to keep the index, None to not cache it on disk
+        """
+        current = fingerprint(find_stablelists(releasedirs))
+        index = _LOADED.get(tuple(releasedirs))
+        if index is not None and index.fingerprint == current:
+            return index
+
+        index = cls._load_cachefile(releasedirs, cachefile, current)
+        _LOADED[tuple(releasedirs)] = index
+        return index
+
+    @classmethod
+    def _load_cachefile(cls, releasedirs, cachefile, current):
+        """
+            get the index with fingerprint current from cachefile or build it
+        """
+        if not cachefile:
+            return cls.build(releasedirs)
+
+        cachefile = os.path.expanduser(cachefile)
+        try:
+            with open(cachefile, "r") as fptr:
+                index = cls.from_json(json.load(fptr))
+            if index.fingerprint == current:
+                return index
+        except (IOError, ValueError, TypeError, KeyError):
+            pass
+
+        index = cls.build(releasedirs)
+        try:
+            os.makedirs(os.path.dirname(cachefile), exist_ok=True)
+            (fd, tmpname) = tempfile.mkstemp(dir=os.path.dirname(cachefile))
+            with os.fdopen(fd, "w") as fptr:
+                json.dump(index.to_json(), fptr)
+            os.replace(tmpname, cachefile)
+        except IOError as err:
+            print("unable to write stablelist cache %s: %s"%(cachefile, err))
+        return index
+
+    def to_json(self):
+        """
+            get the index as plain lists and dicts for writing out as json,
+            the cache is json rather than pickle so loading a cache file someone
+            else can write can't run code
+        """
+        return {'fingerprint': self.fingerprint,
+                'stablelists': [{'release': release, 'arch': arch, 'symbols': sorted(symbols)}
+                                for (release, arch), symbols in self.stablelists.items()]}
+
+    @classmethod
+    def from_json(cls, data):
+        """
+            create an index from the output of to_json
+        """
+        return cls(str(data['fingerprint']),
+                   {(str(s['release']), str(s['arch'])): frozenset(map(str, s['symbols']))
+                    for s in data['stablelists']})
+
+    def share(self):
+        """
+            get a copy of the index with each stablelist in shared memory, so
+            pickling it to send to worker processes only sends the block names.
+            the caller must unlink() each SharedSymbolSet in the copy's
+            stablelists when the workers are finished
+        """
+        return StablelistIndex(self.fingerprint,
+                               {key: kscshared.SharedSymbolSet.create(symbols)
+                                for key, symbols in self.stablelists.items()})
+
+    def get(self, releasedir, arch):
+        """
+            get the stable symbols for arch in releasedir or None if there is
+            no stablelist for it
+        """
+        return self.stablelists.get((release_name(releasedir), arch))
@@ -0,0 +1,189 @@
+"""
+    read kernel Module.symvers files, plain or compressed
+"""
+import os
+import sys
+import gzip
+import lzma
+import zlib
+import threading
+import collections
+import collections.abc
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# errors that reading a missing, unreadable or corrupt symvers file can raise,
+# ValueError covers a crc that isn't hex or a name that isn't utf-8
+SYMVERS_ERRORS = (IOError, EOFError, ValueError, lzma.LZMAError, zlib.error)
+if zstandard is not None:
+    SYMVERS_ERRORS += (zstandard.ZstdError,)
+
+# compressed variants of Module.symvers we look for, in order of preference
+SYMVERS_SUFFIXES = ("", ".xz", ".zst", ".gz")
+
+# how much decompressed data is held in memory at once while parsing
+CHUNK_SIZE = 256 * 1024
+
+
+def find_symvers(symverdir, kernelversion):
+    """
+        get the path to the Module.symvers file for a kernel, this is the first
+        of Module.symvers, Module.symvers.xz, Module.symvers.zst and
+        Module.symvers.gz that exists, or the uncompressed name if none do
+        (so opening it reports the missing file)
+    """
+    symverfile = os.path.join(symverdir, kernelversion, "Module.symvers")
+    for suffix in SYMVERS_SUFFIXES:
+        if os.path.isfile(symverfile + suffix):
+            return symverfile + suffix
+    return symverfile
+
+
+def open_symvers(path):
+    """
+        open a symvers file for reading as a binary stream, decompressing it
+        on the fly if the name ends in .xz, .zst or .gz
+    """
+    if path.endswith(".xz"):
+        return lzma.open(path, "rb")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise IOError("reading %s requires the zstandard python module"%path)
+        # pzstd and concatenated files have more than one frame
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True,
+                                                          read_across_frames=True)
+    return open(path, "rb")
+
+
+def iter_lines(fptr, chunk_size=CHUNK_SIZE):
+    """
+        yield the lines (as bytes without the newline) of a binary stream
+        reading it chunk_size bytes at a time so the whole (decompressed)
+        file is never held in memory
+    """
+    remainder = b""
+    while True:
+        chunk = fptr.read(chunk_size)
+        if not chunk:
+            break
+        lines = (remainder + chunk).split(b"\n")
+        remainder = lines.pop()
+        yield from lines
+    if remainder:
+        yield remainder
+
+
+class SymversTable(collections.abc.Mapping):
+    """
+        a compact read only mapping of symbol name to crc for one kernel.
+        symbol names are interned so kernels share a single copy of each name
+        and crcs are held as ints rather than strings, lookups are a single
+        dict lookup
+        crcs - dict - the symbol names (key) to their crc as an int (value)
+    """
+    def __init__(self, crcs):
+        """
+            setup the table
+        """
+        self._crcs = crcs
+        # KscResult looks up every symbol a kmod uses with get(), using the
+        # dict's own method saves a python level call for each one
+        self.get = crcs.get
+
+    @classmethod
+    def from_lines(cls, lines):
+        """
+            create a table from the lines (as bytes) of a Module.symvers file
+        """
+        crcs = dict()
+        for line in lines:
+            if line.startswith(b"["):
+                continue
+            fields = line.split(None, 2)
+            if len(fields) < 2:
+                continue
+            crcs[sys.intern(fields[1].decode())] = int(fields[0], 16)
+        return cls(crcs)
+
+    def __getitem__(self, name):
+        return self._crcs[name]
+
+    def __contains__(self, name):
+        return name in self._crcs
+
+    def __iter__(self):
+        return iter(self._crcs)
+
+    def __len__(self):
+        return len(self._crcs)
+
+
+def read_symvers(symverdir, kernelversion):
+    """
+        read the list of symbols in the kernel
+        returns a SymversTable of symbol name to crc
+        raises one of SYMVERS_ERRORS if there is no readable Module.symvers for the kernel
+    """
+    return read_symvers_file(find_symvers(symverdir, kernelversion))
+
+
+def read_symvers_file(path):
+    """
+        read a (possibly compressed) Module.symvers file into a SymversTable
+    """
+    if path.endswith(SYMVERS_SUFFIXES[1:]):
+        with open_symvers(path) as fptr:
+            return SymversTable.from_lines(iter_lines(fptr))
+
+    with open(path, "rb") as fptr:
+        return SymversTable.from_lines(fptr)
+
+
+class SymversCache():
+    """
+        a bounded cache of SymversTables for reuse across runs in one process.
+        entries are keyed on the path, size and modification time of the file
+        they were read from, so a kernel-devel tree updated in place or a newly
+        added compressed variant is read again rather than served stale
+        max_entries - int - the number of tables kept, the least recently used
+                            is dropped when there are more
+    """
+    def __init__(self, max_entries=64):
+        """
+            setup an empty cache
+        """
+        self.max_entries = max_entries
+        self._tables = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def read_symvers(self, symverdir, kernelversion):
+        """
+            get the symbols of a kernel from the cache or by reading them
+            raises one of SYMVERS_ERRORS as read_symvers does
+        """
+        path = os.path.realpath(find_symvers(symverdir, kernelversion))
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if key in self._tables:
+                self._tables.move_to_end(key)
+                return self._tables[key]
+
+        table = read_symvers_file(path)
+        with self._lock:
+            self._tables[key] = table
+            while len(self._tables) > self.max_entries:
+                self._tables.popitem(last=False)
+        return table
+
+    def clear(self):
+        """
+            drop every cached table
+        """
+        with self._lock:
+            self._tables.clear()